@@ -22,14 +22,19 @@ limitations under the License.
 
 # pylint: disable=too-many-lines,invalid-name
 
-import argparse
+import collections
+import contextlib
+import errno
+import functools
+import itertools
 import logging
 import os
+import re
 import socket
-import subprocess
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import types
 from enum import Enum
+from time import monotonic
 
 
 class VerboseLevel(Enum):
@@ -42,6 +47,12 @@ class VerboseLevel(Enum):
     INFO = 2
 
 
+class ActiveProTimeout(TimeoutError):
+    """
+    The Active-PRO application did not respond in time.
+    """
+
+
 class CustomFormatter(logging.Formatter):
     """
     Custom formatter for logging messages.
@@ -79,18 +90,372 @@ ch.setFormatter(formatter)
 logger.addHandler(ch)
 
 
-class ActiveProAPI:  # pylint: disable=too-many-public-methods
+def _detect_path_mode():
+    """
+    Detect how file paths are passed to the Active-PRO application.
+
+    Returns:
+        str: "nt", "cygwin", "wsl" or "posix".
+    """
+    if os.name == "nt":
+        return "nt"
+    if "CYGWIN" in os.environ:
+        return "cygwin"
+    if "WSL_DISTRO_NAME" in os.environ:
+        return "wsl"
+    return "posix"
+
+
+# The platform does not change while running, detect it once
+_PATH_MODE = _detect_path_mode()
+
+# Tools converting a path to a Windows path, by path mode
+_PATH_CONVERTERS = {"cygwin": "cygpath", "wsl": "wslpath"}
+
+# Windows drives as mounted, by path mode: the paths on them are
+# converted without running the tools
+_DRIVE_PATH = {
+    "cygwin": re.compile(r"/cygdrive/([a-zA-Z])(?=/|$)"),
+    "wsl": re.compile(r"/mnt/([a-zA-Z])(?=/|$)"),
+}
+
+# Set ACTIVEPRO_PATH_TOOL to always convert the paths with the tools
+_USE_PATH_TOOL = bool(os.environ.get("ACTIVEPRO_PATH_TOOL"))
+
+# WSL distribution, its files are shared as \\wsl$\<distribution>
+_WSL_DISTRO = os.environ.get("WSL_DISTRO_NAME")
+
+# Options set on the socket by default, as (level, option, value).
+# Commands are small request/response exchanges: disable Nagle's
+# algorithm so that each command is sent immediately.
+DEFAULT_SOCKET_OPTIONS = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)]
+
+# Size of the response buffer, it grows for longer responses
+_RECV_BUFFER_SIZE = 65536
+
+# Results of connect_ex() on a non-blocking socket while connecting
+_CONNECT_IN_PROGRESS = {
+    errno.EINPROGRESS,
+    errno.EWOULDBLOCK,
+    getattr(errno, "WSAEWOULDBLOCK", errno.EWOULDBLOCK),
+}
+
+# Encoded commands, only the arguments of a command are encoded when
+# sending it. The commands taking arguments end with a space.
+_CMD_HELLO = b"Hello"
+_CMD_IS_CONNECTED = b"isConnected"
+_CMD_START_CAPTURE = b"StartCapture"
+_CMD_STOP_CAPTURE = b"StopCapture"
+_CMD_IS_CAPTURING = b"isCapturing"
+_CMD_GET_CAPTURE_SIZE = b"GetCaptureSize"
+_CMD_GET_CAPTURE_TIME = b"GetCaptureTime"
+_CMD_GET_LOGIC = b"GetLogic"
+_CMD_GET_CH1 = b"GetCH1"
+_CMD_GET_CH2 = b"GetCH2"
+_CMD_GET_CH3 = b"GetCH3"
+_CMD_CLEAR_NOTE = b"ClearNote"
+_CMD_ZOOM_ALL = b"ZoomAll"
+_CMD_GET_CURSOR_X1 = b"GetCursorX1"
+_CMD_GET_CURSOR_X2 = b"GetCursorX2"
+_CMD_SHOW_INPUTS = b"ShowInputs"
+_CMD_SHOW_OUTPUTS = b"ShowOutputs"
+_CMD_SHOW_LIST = b"ShowList"
+_CMD_SHOW_SETTINGS = b"ShowSettings"
+_CMD_SHOW_NOTES = b"ShowNotes"
+_CMD_CLOSE_TABS = b"CloseTabs"
+_CMD_NEW_CAPTURE = b"NewCapture"
+_CMD_EXIT = b"Exit"
+_CMD_SET_D0_MODE = b"SetD0Mode "
+_CMD_SET_D0_PWM = b"SetD0PWM "
+_CMD_SET_D1_MODE = b"SetD1Mode "
+_CMD_SET_D1_PWM = b"SetD1PWM "
+_CMD_SET_A0_MODE = b"SetA0Mode "
+_CMD_SET_A0_DC_LEVEL = b"SetA0DCLEVEL "
+_CMD_SET_A1_MODE = b"SetA1Mode "
+_CMD_SET_A1_DC_LEVEL = b"SetA1DCLEVEL "
+_CMD_SET_A1_MINIMUM = b"SetA1MINIMUM "
+_CMD_SET_A1_MAXIMUM = b"SetA1MAXIMUM "
+_CMD_SET_A1_STEPS = b"SetA1Steps "
+_CMD_SET_CURSOR_CURRENT = b"SetCursorCurrent "
+_CMD_SET_CURSOR_X1 = b"SetCursorX1 "
+_CMD_SET_CURSOR_X2 = b"SetCursorX2 "
+_CMD_SEARCH = b"Search "
+_CMD_ZOOM_FROM = b"ZoomFrom "
+_CMD_OPEN_CAPTURE = b"OpenCapture "
+_CMD_SAVE_CAPTURE = b"SaveCapture "
+_CMD_SAVE_BETWEEN_CURSORS = b"SaveBetweenCursors "
+_CMD_OPEN_CONFIGURATION = b"OpenConfiguration "
+_CMD_SAVE_CONFIGURATION = b"SaveConfiguration "
+_CMD_EXPORT_BETWEEN_CURSORS = b"ExportBetweenCursors "
+_CMD_SAVE_SCREENSHOT = b"SaveScreenshot "
+_CMD_APPEND_NOTE = b"AppendNote "
+
+# Encoded setter commands for the valid integer values of the modes and
+# of the PWM percentages, by (command, value)
+_SETTER_COMMANDS = {
+    (command, value): command + str(value).encode()
+    for command, values in (
+        (_CMD_SET_D0_MODE, range(4)),
+        (_CMD_SET_D1_MODE, range(4)),
+        (_CMD_SET_A0_MODE, range(7)),
+        (_CMD_SET_A1_MODE, range(11)),
+        (_CMD_SET_D0_PWM, range(101)),
+        (_CMD_SET_D1_PWM, range(101)),
+    )
+    for value in values
+}
+
+
+# Numerical values of the textual output modes
+_A0_MODE_MAP = types.MappingProxyType(
+    {
+        "tristate": 0,
+        "0v": 1,
+        "1v": 2,
+        "2v": 3,
+        "3v": 4,
+        "3.3v": 5,
+        "dc": 6,
+    }
+)
+_A1_MODE_MAP = types.MappingProxyType(
+    {
+        **_A0_MODE_MAP,
+        "ramp": 7,
+        "sine": 8,
+        "square": 9,
+        "triangle": 10,
+    }
+)
+_D0_MODE_MAP = types.MappingProxyType(
+    {"tristate": 0, "0v": 1, "3.3v": 2, "pwm": 3}
+)
+_D1_MODE_MAP = _D0_MODE_MAP
+
+
+def _setter_command(command, value):
+    """
+    Encode a setter command, from _SETTER_COMMANDS when possible.
+
+    Args:
+        command (bytes): The encoded command, ending with a space.
+        value: The value to set.
+
+    Returns:
+        bytes: The encoded command with its value.
+    """
+    # Exactly int: a bool or a float equal to a key is sent as written
+    if type(value) is int:  # pylint: disable=unidiomatic-typecheck
+        encoded = _SETTER_COMMANDS.get((command, value))
+        if encoded is not None:
+            return encoded
+    if type(value) in (int, float):
+        # Their repr is their str, formatted without a str object
+        return b"%s%r" % (command, value)
+    return command + str(value).encode()
+
+
+@functools.lru_cache(maxsize=256)
+def _convert_path(abs_path, path_mode):
+    """
+    Convert an absolute path for the Active-PRO application.
+
+    Paths on the Windows drives, and under WSL the paths of the
+    distribution, are converted directly. The others are converted with
+    cygpath or wslpath, so the result is cached as converting may run a
+    subprocess.
+
+    Args:
+        abs_path (str): The absolute path of the file.
+        path_mode (str): The path mode (see _detect_path_mode).
+
+    Returns:
+        str: The path to give to the Active-PRO application.
+    """
+    if path_mode in _PATH_CONVERTERS:
+        if not _USE_PATH_TOOL:
+            match = _DRIVE_PATH[path_mode].match(abs_path)
+            if match:
+                end = match.end()
+                rest = abs_path[end:].lstrip("/").replace("/", "\\")
+                return match.group(1).upper() + ":\\" + rest
+            if path_mode == "wsl":
+                return "\\\\wsl$\\" + _WSL_DISTRO + abs_path.replace("/", "\\")
+        # Rarely needed, not imported with the module
+        import subprocess  # pylint: disable=import-outside-toplevel
+
+        result = subprocess.run(
+            [_PATH_CONVERTERS[path_mode], "-w", abs_path],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return result.stdout.strip()
+    return abs_path
+
+
+def _not_pipelined(method):
+    """
+    Mark an ActiveProAPI method that run_script() calls on its own, as it
+    uses its responses or closes the application.
+
+    Args:
+        method (function): The method to mark.
+
+    Returns:
+        function: The method.
+    """
+    method.not_pipelined = True
+    return method
+
+
+# pylint: disable-next=too-many-public-methods,too-many-instance-attributes
+class ActiveProAPI:
     """
     A class to interact with the Active-PRO application API.
+
+    An instance is a context manager, connected within the with
+    statement, e.g. with a port from find_available_ports():
+
+        with ActiveProAPI(port=port) as api:
+            api.hello()
+
+    Args:
+        host (str): The host of the Active-PRO application.
+        port (int): The port of the Active-PRO application API.
+        verbose (VerboseLevel): The verbose level.
+        socket_options (list): The (level, option, value) tuples to set
+            on the socket before connecting. Defaults to
+            DEFAULT_SOCKET_OPTIONS, extend it to keep TCP_NODELAY.
+        recv_buf (int): The size of the kernel receive buffer (SO_RCVBUF),
+            None, the default, to keep the system default and its
+            autotuning, which setting a size turns off on Linux.
+        send_buf (int): The size of the kernel send buffer (SO_SNDBUF),
+            None, the default, to keep the system default and its
+            autotuning.
+        connect_timeout (float): The seconds to wait for the connection,
+            None to wait as long as the system does.
+        command_timeout (float): The seconds to wait for sending a
+            command or receiving its response, None to wait forever.
+        file_timeout (float): The seconds to wait for the response to a
+            file command (save, export or open), only sent once the file
+            is done, None to wait forever.
     """
 
-    def __init__(
-        self, host="localhost", port=37800, verbose=VerboseLevel.INFO
+    # Seconds during which a read capture time is reused
+    CAPTURE_TIME_TTL = 0.05
+
+    __slots__ = (
+        "host",
+        "port",
+        "socket_options",
+        "recv_buf",
+        "send_buf",
+        "connect_timeout",
+        "command_timeout",
+        "file_timeout",
+        "socket",
+        "_wfile",
+        "_verbose",
+        "_log_info",
+        "_print_result",
+        "_rbuf",
+        "_rview",
+        "_rpos",
+        "_rlen",
+        "_cached_capture_time",
+        "_cached_capture_time_at",
+        "_capturing",
+        "_file_pending",
+        "_pipelined",
+        "_pipeline_responses",
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        host="localhost",
+        port=37800,
+        verbose=VerboseLevel.INFO,
+        socket_options=None,
+        *,
+        recv_buf=None,
+        send_buf=None,
+        connect_timeout=2.0,
+        command_timeout=5.0,
+        file_timeout=None,
     ):
         self.host = host
         self.port = port
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if socket_options is None:
+            socket_options = DEFAULT_SOCKET_OPTIONS
+        self.socket_options = list(socket_options)
+        self.recv_buf = recv_buf
+        self.send_buf = send_buf
+        self.connect_timeout = connect_timeout
+        self.command_timeout = command_timeout
+        self.file_timeout = file_timeout
+        self.socket = None
+        # Buffered writer on the socket, flushed when waiting for responses
+        self._wfile = None
         self.verbose = verbose
+        # Receive buffer, allocated once and reused for every response.
+        # The data from self._rpos to self._rlen is not yet returned.
+        self._rbuf = bytearray(_RECV_BUFFER_SIZE)
+        self._rview = memoryview(self._rbuf)
+        self._rpos = 0
+        self._rlen = 0
+        # Capture time last read to resolve negative times, and when
+        # it was read
+        self._cached_capture_time = None
+        self._cached_capture_time_at = 0.0
+        # Whether the application is capturing, as far as this client
+        # knows: None until known
+        self._capturing = None
+        # Whether a file command waits for its response, read with
+        # file_timeout
+        self._file_pending = False
+        # Number of responses left to read by pipeline(), None outside it,
+        # and the list of its responses
+        self._pipelined = None
+        self._pipeline_responses = None
+
+    def __enter__(self):
+        """
+        Connect when entering the with statement.
+
+        Returns:
+            ActiveProAPI: The connected instance.
+        """
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Disconnect when leaving the with statement.
+        """
+        self.disconnect()
+
+    def __del__(self):
+        # Close a connection left open, __init__ may not have completed
+        if getattr(self, "socket", None) is not None:
+            try:
+                self.disconnect()
+            except OSError:
+                pass
+
+    @property
+    def verbose(self):
+        """
+        VerboseLevel: The verbose level.
+        """
+        return self._verbose
+
+    @verbose.setter
+    def verbose(self, verbose):
+        self._verbose = verbose
+        # Checked for every command and response
+        self._log_info = verbose == VerboseLevel.INFO
+        self._print_result = verbose == VerboseLevel.RESULT
 
     def connect(self):
         """
@@ -101,33 +466,436 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
             logger.info(
                 "Connecting to ID: %d - %s:%d", api_id, self.host, self.port
             )
-        self.socket.connect((self.host, self.port))
+        # Create the socket here so that the instance can reconnect
+        # after a disconnect().
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # Size the kernel buffers before connecting so that the TCP
+        # window is negotiated accordingly.
+        if self.recv_buf is not None:
+            self.socket.setsockopt(
+                socket.SOL_SOCKET, socket.SO_RCVBUF, self.recv_buf
+            )
+        if self.send_buf is not None:
+            self.socket.setsockopt(
+                socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buf
+            )
+        for level, optname, value in self.socket_options:
+            self.socket.setsockopt(level, optname, value)
+        self._rpos = self._rlen = 0
+        self._capturing = None
+        self._file_pending = False
+        self.socket.settimeout(self.connect_timeout)
+        try:
+            self.socket.connect((self.host, self.port))
+        except socket.timeout:
+            self.socket.close()
+            self.socket = None
+            raise TimeoutError(
+                f"Connection to {self.host}:{self.port} timed out after "
+                f"{self.connect_timeout}s"
+            ) from None
+        except OSError:
+            self.socket.close()
+            self.socket = None
+            raise
+        self.socket.settimeout(self.command_timeout)
+        self._wfile = self.socket.makefile("wb", buffering=65536)
 
     def disconnect(self):
         """
         Disconnect from the Active-PRO application.
         """
-        self.socket.close()
+        if self.socket is not None:
+            try:
+                # Closing the writer sends commands still buffered
+                self._wfile.close()
+            finally:
+                self._wfile = None
+                self.socket.close()
+                self.socket = None
+                self._invalidate_capture_cache()
+
+    @contextlib.contextmanager
+    def pipeline(self):
+        """
+        Send the commands of the with block together, their responses are
+        only read when leaving the block.
+
+        Within the block the methods return None, so only call the ones
+        returning the response unchanged or not using it (get_*, show_*,
+        set_*, save_*, ...). The capture time needed by negative times is
+        still read when needed.
+
+        Yields:
+            list: The responses (str), in order, filled when leaving.
+        """
+        responses = []
+        self._pipelined = 0
+        self._pipeline_responses = responses
+        try:
+            yield responses
+        finally:
+            # Read the responses even on error to stay in sync
+            count = self._pipelined
+            self._pipelined = self._pipeline_responses = None
+            if self.socket is not None:
+                responses.extend(self._read_responses(count))
+
+    @contextlib.contextmanager
+    def _outside_pipeline(self):
+        """
+        Read the responses pipelined so far, so that the commands of the
+        with block get their response.
+        """
+        if self._pipelined is None:
+            yield
+            return
+        count = self._pipelined
+        self._pipelined = None
+        try:
+            self._pipeline_responses.extend(self._read_responses(count))
+            yield
+        finally:
+            self._pipelined = 0
+
+    def run_script(self, items, batch_size=16):
+        """
+        Call a sequence of methods, pipelined by batches, such as a sweep:
+
+            api.run_script([("set_a1_dc_level", (v,)) for v in volts])
+
+        The methods marked with _not_pipelined, which need their
+        responses, are called on their own, between the batches.
+
+        Args:
+            items (list): The (method name, arguments tuple) pairs.
+            batch_size (int): The maximum number of calls sent together.
+
+        Returns:
+            list: The results, in order. The response (str) for the
+            pipelined calls, or the list of responses for a call sending
+            several commands.
+        """
+        results = []
+        for barrier, calls in itertools.groupby(
+            items,
+            key=lambda item: getattr(
+                getattr(self, item[0]), "not_pipelined", False
+            ),
+        ):
+            calls = list(calls)
+            if barrier:
+                results.extend(
+                    getattr(self, name)(*args) for name, args in calls
+                )
+                continue
+            for start in range(0, len(calls), batch_size):
+                end = start + batch_size
+                results.extend(self._run_pipelined(calls[start:end]))
+        return results
+
+    def _run_pipelined(self, items):
+        """
+        Call methods in one pipeline and collect the responses of each.
+
+        Args:
+            items (list): The (method name, arguments tuple) pairs.
+
+        Returns:
+            list: The result of each call, see run_script().
+        """
+        counts = []
+        with self.pipeline() as responses:
+            for name, args in items:
+                # The responses read so far and the pending ones: the
+                # capture time is read in between for negative times.
+                sent = len(responses) + self._pipelined
+                getattr(self, name)(*args)
+                counts.append(len(responses) + self._pipelined - sent)
+        results = []
+        position = 0
+        for count in counts:
+            end = position + count
+            if count == 1:
+                results.append(responses[position])
+            else:
+                results.append(responses[position:end])
+            position = end
+        return results
+
+    def flush_pending(self):
+        """
+        Send the commands that are still in the write buffer.
+        """
+        if self._wfile is not None:
+            try:
+                self._wfile.flush()
+            except socket.timeout:
+                self._send_timed_out()
 
     def send_command(self, command):
         """
         Send a command to the Active-PRO application.
 
         Args:
-            command (str): The command to send.
+            command (str or bytes): The command to send.
 
         Returns:
             str: The response from the application.
         """
-        if self.verbose == VerboseLevel.INFO:
-            logger.info("Command: '%s'", command)
+        return self.send_commands([command])[0]
+
+    def send_commands(self, commands):
+        """
+        Send several commands to the Active-PRO application at once.
 
-        self.socket.sendall((command + "\n").encode())
-        response = self.socket.recv(4096).decode().strip()
+        All commands are buffered and sent together before reading the
+        responses, so the batch costs one round-trip instead of one per
+        command.
 
-        if self.verbose == VerboseLevel.INFO:
-            logger.info("Response: '%s'", response)
-        elif self.verbose == VerboseLevel.RESULT:
+        Args:
+            commands (list): The commands (str or bytes) to send.
+
+        Returns:
+            list: The responses (str) from the application, in order.
+
+        Raises:
+            ValueError: A command contains a newline.
+            ActiveProTimeout: The commands could not be sent, or the
+                application did not respond, within command_timeout. The
+                connection is closed, as a late response would be taken
+                for the next one.
+        """
+        if self.socket is None:
+            raise ConnectionError(
+                "Not connected to the Active-PRO application"
+            )
+
+        commands = [
+            command.encode() if isinstance(command, str) else command
+            for command in commands
+        ]
+        if not commands:
+            return []
+        # A newline ends a command: it would desynchronize the responses.
+        # Check before buffering anything, to not send part of the batch.
+        for command in commands:
+            if b"\n" in command:
+                raise ValueError(f"Newline in command: {command!r}")
+
+        if self._log_info and logger.isEnabledFor(logging.INFO):
+            for command in commands:
+                logger.info("Command: '%s'", command.decode())
+        # The buffered writer holds the batch, it is sent when reading
+        # the first response.
+        self._write(b"\n".join(commands) + b"\n")
+        return self._read_responses(len(commands))
+
+    def _send_file_command(self, command, filename, default_extension):
+        """
+        Send one file command, its response is read with file_timeout.
+
+        Args:
+            command (bytes): The encoded command, ending with a space.
+            filename (str): The name of the file.
+            default_extension (str): The default file extension.
+
+        Returns:
+            str: The response from the application.
+        """
+        path = self.get_absolute_path(filename, default_extension)
+        # Set before sending, then cleared when reading. In a pipeline
+        # the responses are only read when leaving it.
+        self._file_pending = True
+        try:
+            return self.send_command(command + path.encode())
+        except (ValueError, OSError):
+            # Rejected or not sent, the next commands keep command_timeout
+            self._file_pending = False
+            raise
+
+    def _send_setter(self, command, value):
+        """
+        Send one setter command, directly when the value is a number.
+
+        Args:
+            command (bytes): The encoded command, ending with a space.
+            value: The value to set.
+
+        Returns:
+            str: The response from the application.
+        """
+        encoded = _setter_command(command, value)
+        # Exactly int or float: their text cannot contain a newline
+        if type(value) in (int, float):
+            return self._send_bytes(encoded)
+        return self.send_command(encoded)
+
+    def _send_bytes(self, command):
+        """
+        Send one encoded command, known to be valid.
+
+        Args:
+            command (bytes): The command, one of the _CMD_* constants or
+                a setter command with a number.
+
+        Returns:
+            str: The response from the application.
+        """
+        if self.socket is None:
+            raise ConnectionError(
+                "Not connected to the Active-PRO application"
+            )
+        if self._log_info and logger.isEnabledFor(logging.INFO):
+            logger.info("Command: '%s'", command.decode())
+        self._write(command + b"\n")
+        return self._read_responses(1)[0]
+
+    def _read_responses(self, count):
+        """
+        Read the responses to the commands sent.
+
+        Args:
+            count (int): The number of responses to read.
+
+        Returns:
+            list: The responses (str) from the application, in order.
+
+        Raises:
+            ActiveProTimeout: The application did not respond within
+                command_timeout, or file_timeout when a file command is
+                among them. The connection is closed.
+        """
+        if self._pipelined is not None:
+            # Read when leaving pipeline()
+            self._pipelined += count
+            return [None] * count
+        file_pending = self._file_pending
+        timeout = self.file_timeout if file_pending else self.command_timeout
+        if file_pending:
+            self._file_pending = False
+            self.socket.settimeout(timeout)
+        try:
+            return [self._read_response() for _ in range(count)]
+        except socket.timeout:
+            self._close_out_of_sync()
+            raise ActiveProTimeout(
+                "No response from the Active-PRO application within "
+                f"{timeout}s"
+            ) from None
+        finally:
+            if file_pending and self.socket is not None:
+                self.socket.settimeout(self.command_timeout)
+
+    def _write(self, data):
+        """
+        Buffer commands for the socket. Data larger than the buffer is
+        written at once.
+
+        Args:
+            data (bytes): The encoded commands, with their newlines.
+
+        Raises:
+            ActiveProTimeout: The data could not be sent within
+                command_timeout, the connection is closed.
+        """
+        try:
+            self._wfile.write(data)
+        except socket.timeout:
+            self._send_timed_out()
+
+    def _send_timed_out(self):
+        """
+        Close the connection after a send timed out.
+
+        Raises:
+            ActiveProTimeout: Always.
+        """
+        self._close_out_of_sync()
+        raise ActiveProTimeout(
+            "Could not send to the Active-PRO application within "
+            f"{self.command_timeout}s"
+        ) from None
+
+    def _close_out_of_sync(self):
+        """
+        Close the connection after a timeout: a late response, or the
+        rest of a command, would be taken for the next one.
+        """
+        # Closed first so that the commands still buffered are dropped
+        # instead of waiting again to send them.
+        self.socket.close()
+        try:
+            self.disconnect()
+        except OSError:
+            pass
+
+    def batch(self, commands):
+        """
+        Send several commands with their arguments at once.
+
+        Args:
+            commands (list): The commands, as tuples of the command name
+                followed by its arguments, e.g. ("SetD0Mode", 3).
+
+        Returns:
+            list: The responses (str) from the application, in order.
+        """
+        return self.send_commands(
+            [" ".join(str(part) for part in command) for command in commands]
+        )
+
+    def _read_response(self):
+        """
+        Read one response line from the Active-PRO application.
+
+        Returns:
+            str: The response from the application.
+        """
+        pos = start = self._rpos
+        while True:
+            end = self._rlen
+            index = self._rbuf.find(b"\n", start, end)
+            if index >= 0:
+                break
+            start = end
+            if end == len(self._rbuf):
+                if pos:
+                    # Move the data not yet returned to the buffer start
+                    end -= pos
+                    start = end
+                    self._rview[:end] = self._rview[pos:]
+                    pos = self._rpos = 0
+                    self._rlen = end
+                else:
+                    # The response does not fit: double the buffer size
+                    self._rview.release()
+                    self._rbuf.extend(bytes(end))
+                    self._rview = memoryview(self._rbuf)
+            self.flush_pending()
+            received = self.socket.recv_into(self._rview[end:])
+            if not received:
+                raise ConnectionError(
+                    "Connection closed by the Active-PRO application"
+                )
+            self._rlen += received
+        response = bytes(self._rview[pos:index]).decode().strip()
+
+        # The next response starts after the newline. Pipelined responses
+        # are returned in place, the buffer is rewound once all are read.
+        self._rpos = index + 1
+        if self._rpos == self._rlen:
+            self._rpos = self._rlen = 0
+            if len(self._rbuf) > _RECV_BUFFER_SIZE:
+                # Give back the memory taken by an unusually long response
+                self._rview.release()
+                del self._rbuf[_RECV_BUFFER_SIZE:]
+                self._rview = memoryview(self._rbuf)
+
+        if self._log_info:
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Response: '%s'", response)
+        elif self._print_result:
             print(f"{response}{os.linesep}")
         return response
 
@@ -135,34 +903,53 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         """
         Find available ports in the range 37800 to 37810.
 
+        All ports are probed at once with non-blocking connections,
+        during 50 ms at most.
+
         Returns:
             dict: A dictionary with keys as IDs and values as port numbers.
         """
         available_ports_dict = {}
 
-        def check_port(available_port):
-            try:
-                logger.log(
-                    logging.DEBUG, "Try %s:%d", self.host, available_port
-                )
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.settimeout(0.050)
-                    if s.connect_ex((self.host, available_port)) == 0:
-                        return available_port
-            except Exception as e:  # pylint: disable=broad-exception-caught
-                logger.log(logging.ERROR, "Exception: %s", e)
-            return None
+        try:
+            address = socket.gethostbyname(self.host)
+        except OSError as e:
+            logger.error("Exception: %s", e)
+            return available_ports_dict
 
-        with ThreadPoolExecutor() as executor:
-            futures = {
-                executor.submit(check_port, available_port): available_port
-                for available_port in range(37800, 37811)
-            }
-            for future in as_completed(futures):
-                available_port = future.result()
-                if available_port:
-                    available_id = available_port - 37800 + 1
-                    available_ports_dict[available_id] = available_port
+        # Only needed to scan the ports, not imported with the module
+        import selectors  # pylint: disable=import-outside-toplevel
+
+        with selectors.DefaultSelector() as selector:
+            try:
+                for available_port in range(37800, 37811):
+                    logger.debug("Try %s:%d", self.host, available_port)
+                    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    s.setblocking(False)
+                    error = s.connect_ex((address, available_port))
+                    if error not in (0, *_CONNECT_IN_PROGRESS):
+                        s.close()
+                        continue
+                    selector.register(s, selectors.EVENT_WRITE, available_port)
+
+                deadline = monotonic() + 0.050
+                while selector.get_map():
+                    timeout = deadline - monotonic()
+                    if timeout <= 0:
+                        break
+                    for key, _ in selector.select(timeout):
+                        selector.unregister(key.fileobj)
+                        error = key.fileobj.getsockopt(
+                            socket.SOL_SOCKET, socket.SO_ERROR
+                        )
+                        key.fileobj.close()
+                        if error == 0:
+                            available_id = key.data - 37800 + 1
+                            available_ports_dict[available_id] = key.data
+            finally:
+                for key in list(selector.get_map().values()):
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
 
         return available_ports_dict
 
@@ -173,7 +960,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command("Hello")
+        return self._send_bytes(_CMD_HELLO)
 
     def is_connected(self):
         """
@@ -182,7 +969,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command("isConnected")
+        return self._send_bytes(_CMD_IS_CONNECTED)
 
     def start_capture(self):
         """
@@ -191,7 +978,10 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command("StartCapture")
+        self._invalidate_capture_cache()
+        response = self._send_bytes(_CMD_START_CAPTURE)
+        self._capturing = True
+        return response
 
     def stop_capture(self):
         """
@@ -200,27 +990,40 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command("StopCapture")
+        self._invalidate_capture_cache()
+        response = self._send_bytes(_CMD_STOP_CAPTURE)
+        self._capturing = False
+        return response
 
+    @_not_pipelined
     def is_capturing(self):
         """
         Check if the application is capturing data.
 
         Returns:
-            bool: True if capturing, False otherwise.
+            bool: True if capturing, False otherwise. None in a pipeline.
         """
-        response = self.send_command("isCapturing")
-        return response.lower() != "yes"
+        response = self._send_bytes(_CMD_IS_CAPTURING)
+        if response is None:
+            # Pipelined, the state is only known once the response is read
+            self._capturing = None
+            return None
+        self._capturing = response.lower() == "yes"
+        return self._capturing
 
+    @_not_pipelined
     def is_not_capturing(self):
         """
         Check if the application is not capturing data.
 
         Returns:
-            bool: True if not capturing, False otherwise.
+            bool: True if not capturing, False otherwise. None in a
+            pipeline.
         """
-        response = self.send_command("isCapturing")
-        return response.lower() == "no"
+        capturing = self.is_capturing()
+        if capturing is None:
+            return None
+        return not capturing
 
     def get_capture_size(self):
         """
@@ -229,7 +1032,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command("GetCaptureSize")
+        return self._send_bytes(_CMD_GET_CAPTURE_SIZE)
 
     def get_capture_time(self):
         """
@@ -238,7 +1041,45 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command("GetCaptureTime")
+        return self._send_bytes(_CMD_GET_CAPTURE_TIME)
+
+    def _get_cached_capture_time(self):
+        """
+        Get the capture time, reading it again only when not known or
+        older than CAPTURE_TIME_TTL, as a running capture keeps growing.
+
+        Returns:
+            float: The capture time.
+        """
+        now = monotonic()
+        if (
+            self._cached_capture_time is None
+            or now - self._cached_capture_time_at > self.CAPTURE_TIME_TTL
+        ):
+            with self._outside_pipeline():
+                self._cached_capture_time = float(self.get_capture_time())
+            self._cached_capture_time_at = now
+        return self._cached_capture_time
+
+    def _invalidate_capture_cache(self):
+        """
+        Forget the capture time, to be called when the capture changes.
+        """
+        self._cached_capture_time = None
+
+    def _resolve_time(self, time):
+        """
+        Resolve a time relative to the end of the capture.
+
+        Args:
+            time (float): The time, negative when relative to the end.
+
+        Returns:
+            float: The absolute time.
+        """
+        if time < 0:
+            time = max(self._get_cached_capture_time() + time, 0)
+        return time
 
     def get_logic(self):
         """
@@ -247,7 +1088,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command("GetLogic")
+        return self._send_bytes(_CMD_GET_LOGIC)
 
     def get_ch1(self):
         """
@@ -256,7 +1097,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command("GetCH1")
+        return self._send_bytes(_CMD_GET_CH1)
 
     def get_ch2(self):
         """
@@ -265,7 +1106,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command("GetCH2")
+        return self._send_bytes(_CMD_GET_CH2)
 
     def get_ch3(self):
         """
@@ -274,7 +1115,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command("GetCH3")
+        return self._send_bytes(_CMD_GET_CH3)
 
     def set_d0_mode(self, param):
         """
@@ -286,7 +1127,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command(f"SetD0Mode {param}")
+        return self._send_setter(_CMD_SET_D0_MODE, param)
 
     def set_d0_pwm(self, percent):
         """
@@ -298,7 +1139,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command(f"SetD0PWM {percent}")
+        return self._send_setter(_CMD_SET_D0_PWM, percent)
 
     def set_d1_mode(self, param):
         """
@@ -310,7 +1151,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command(f"SetD1Mode {param}")
+        return self._send_setter(_CMD_SET_D1_MODE, param)
 
     def set_d1_pwm(self, percent):
         """
@@ -322,7 +1163,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command(f"SetD1PWM {percent}")
+        return self._send_setter(_CMD_SET_D1_PWM, percent)
 
     def set_a0_mode(self, param):
         """
@@ -334,7 +1175,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command(f"SetA0Mode {param}")
+        return self._send_setter(_CMD_SET_A0_MODE, param)
 
     def set_a0_dc_level(self, volts):
         """
@@ -346,7 +1187,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command(f"SetA0DCLEVEL {volts}")
+        return self._send_setter(_CMD_SET_A0_DC_LEVEL, volts)
 
     def set_a1_mode(self, param):
         """
@@ -358,7 +1199,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command(f"SetA1Mode {param}")
+        return self._send_setter(_CMD_SET_A1_MODE, param)
 
     def set_a1_dc_level(self, volts):
         """
@@ -370,7 +1211,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command(f"SetA1DCLEVEL {volts}")
+        return self._send_setter(_CMD_SET_A1_DC_LEVEL, volts)
 
     def set_a1_minimum(self, volts):
         """
@@ -382,7 +1223,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command(f"SetA1MINIMUM {volts}")
+        return self._send_setter(_CMD_SET_A1_MINIMUM, volts)
 
     def set_a1_maximum(self, volts):
         """
@@ -394,7 +1235,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command(f"SetA1MAXIMUM {volts}")
+        return self._send_setter(_CMD_SET_A1_MAXIMUM, volts)
 
     def set_a1_steps(self, steps):
         """
@@ -406,7 +1247,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command(f"SetA1Steps {steps}")
+        return self._send_setter(_CMD_SET_A1_STEPS, steps)
 
     def clear_note(self):
         """
@@ -415,19 +1256,23 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command("ClearNote")
+        return self._send_bytes(_CMD_CLEAR_NOTE)
 
     def append_note(self, string):
         """
         Append a note.
 
+        A multi-line note is appended with one command per line.
+
         Args:
             string (str): The note to append.
 
         Returns:
-            str: The response from the application.
+            str: The response from the application (to the last line).
         """
-        return self.send_command(f"AppendNote {string}")
+        return self.send_commands(
+            [_CMD_APPEND_NOTE + line.encode() for line in string.split("\n")]
+        )[-1]
 
     def set_cursor_current(self, time):
         """
@@ -439,10 +1284,8 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        if time < 0:
-            capture_time = float(self.get_capture_time())
-            time = max(capture_time + time, 0)
-        return self.send_command(f"SetCursorCurrent {time}")
+        time = self._resolve_time(time)
+        return self._send_setter(_CMD_SET_CURSOR_CURRENT, time)
 
     def set_cursor_x1(self, time):
         """
@@ -454,10 +1297,8 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        if time < 0:
-            capture_time = float(self.get_capture_time())
-            time = max(capture_time + time, 0)
-        return self.send_command(f"SetCursorX1 {time}")
+        time = self._resolve_time(time)
+        return self._send_setter(_CMD_SET_CURSOR_X1, time)
 
     def set_cursor_x2(self, time):
         """
@@ -469,10 +1310,8 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        if time < 0:
-            capture_time = float(self.get_capture_time())
-            time = max(capture_time + time, 0)
-        return self.send_command(f"SetCursorX2 {time}")
+        time = self._resolve_time(time)
+        return self._send_setter(_CMD_SET_CURSOR_X2, time)
 
     def zoom_all(self):
         """
@@ -481,7 +1320,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command("ZoomAll")
+        return self._send_bytes(_CMD_ZOOM_ALL)
 
     def zoom_from(self, start, end):
         """
@@ -496,22 +1335,18 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         """
         start = float(start)
         end = float(end)
-        if start < 0 or end < 0:
-            capture_time = float(self.get_capture_time())
-            if start < 0:
-                start = max(capture_time + start, 0)
-            if end < 0:
-                end = max(capture_time + end, 0)
+        start = self._resolve_time(start)
+        end = self._resolve_time(end)
         if end < start:
             (start, end) = (end, start)
         if start == end:
             if start == 0:
-                capture_time = float(self.get_capture_time())
-                end = min(0.001, capture_time)
+                end = min(0.001, self._get_cached_capture_time())
             else:
                 start = max(end - 0.001, 0)
-        return self.send_command(f"ZoomFrom {start} {end}")
+        return self.send_command(_CMD_ZOOM_FROM + f"{start} {end}".encode())
 
+    @_not_pipelined
     def zoom_cursors(self):
         """
         Zoom between the X1 and X2 cursors.
@@ -520,14 +1355,14 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application (zoom_from).
         """
-        x1 = self.send_command("GetCursorX1")
+        x1 = self._send_bytes(_CMD_GET_CURSOR_X1)
         if x1.startswith("ERROR"):
-            logger.log(logging.ERROR, "Error: %s", x1)
+            logger.error("Error: %s", x1)
             return x1
         x1 = float(x1)
-        x2 = self.send_command("GetCursorX2")
+        x2 = self._send_bytes(_CMD_GET_CURSOR_X2)
         if x2.startswith("ERROR"):
-            logger.log(logging.ERROR, "Error: %s", x2)
+            logger.error("Error: %s", x2)
             return x2
         x2 = float(x2)
         return self.zoom_from(x1, x2)
@@ -542,7 +1377,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The timestamp of the search result or "NOTFOUND".
         """
-        return self.send_command(f"Search {string}")
+        return self.send_command(_CMD_SEARCH + str(string).encode())
 
     def show_inputs(self):
         """
@@ -551,7 +1386,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command("ShowInputs")
+        return self._send_bytes(_CMD_SHOW_INPUTS)
 
     def show_outputs(self):
         """
@@ -560,7 +1395,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command("ShowOutputs")
+        return self._send_bytes(_CMD_SHOW_OUTPUTS)
 
     def show_list(self):
         """
@@ -569,7 +1404,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command("ShowList")
+        return self._send_bytes(_CMD_SHOW_LIST)
 
     def show_settings(self):
         """
@@ -578,7 +1413,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command("ShowSettings")
+        return self._send_bytes(_CMD_SHOW_SETTINGS)
 
     def show_notes(self):
         """
@@ -587,7 +1422,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command("ShowNotes")
+        return self._send_bytes(_CMD_SHOW_NOTES)
 
     def close_tabs(self):
         """
@@ -596,7 +1431,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command("CloseTabs")
+        return self._send_bytes(_CMD_CLOSE_TABS)
 
     def new_capture(self):
         """
@@ -605,11 +1440,17 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command("NewCapture")
+        self._invalidate_capture_cache()
+        response = self._send_bytes(_CMD_NEW_CAPTURE)
+        self._capturing = True
+        return response
 
+    @_not_pipelined
     def open_capture(self, filename):
         """
-        Open a capture file.
+        Open a capture file, stopping the capture first. The application
+        is only asked whether it is capturing when this client does not
+        know it already.
 
         Args:
             filename (str): The name of the capture file.
@@ -617,11 +1458,16 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        if self.is_capturing():
+        if self._capturing is None:
+            self.is_capturing()
+        if self._capturing:
             self.stop_capture()
-        return self.send_command(
-            f'OpenCapture {self.get_absolute_path(filename, ".active")}'
+        self._invalidate_capture_cache()
+        response = self._send_file_command(
+            _CMD_OPEN_CAPTURE, filename, ".active"
         )
+        self._capturing = False
+        return response
 
     def save_capture(self, filename):
         """
@@ -633,9 +1479,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command(
-            f'SaveCapture {self.get_absolute_path(filename, ".active")}'
-        )
+        return self._send_file_command(_CMD_SAVE_CAPTURE, filename, ".active")
 
     def save_between_cursors(self, filename):
         """
@@ -647,8 +1491,8 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command(
-            f'SaveBetweenCursors {self.get_absolute_path(filename, ".active")}'
+        return self._send_file_command(
+            _CMD_SAVE_BETWEEN_CURSORS, filename, ".active"
         )
 
     def open_configuration(self, filename):
@@ -661,8 +1505,8 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command(
-            f'OpenConfiguration {self.get_absolute_path(filename, ".active")}'
+        return self._send_file_command(
+            _CMD_OPEN_CONFIGURATION, filename, ".active"
         )
 
     def save_configuration(self, filename):
@@ -675,8 +1519,8 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command(
-            f'SaveConfiguration {self.get_absolute_path(filename, ".active")}'
+        return self._send_file_command(
+            _CMD_SAVE_CONFIGURATION, filename, ".active"
         )
 
     def export_between_cursors(self, filename):
@@ -689,8 +1533,8 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application ("NOTSTOPPED", FILENAME).
         """
-        return self.send_command(
-            f'ExportBetweenCursors {self.get_absolute_path(filename, ".csv")}'
+        return self._send_file_command(
+            _CMD_EXPORT_BETWEEN_CURSORS, filename, ".csv"
         )
 
     def save_screenshot(self, filename):
@@ -703,10 +1547,9 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command(
-            f'SaveScreenshot {self.get_absolute_path(filename, ".png")}'
-        )
+        return self._send_file_command(_CMD_SAVE_SCREENSHOT, filename, ".png")
 
+    @_not_pipelined
     def exit(self):
         """
         Exit the application.
@@ -714,7 +1557,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             str: The response from the application.
         """
-        return self.send_command("Exit")
+        return self._send_bytes(_CMD_EXIT)
 
     def get_absolute_path(self, path, default_extension=""):
         """
@@ -729,25 +1572,7 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         """
         if default_extension and not os.path.splitext(path)[1]:
             path += default_extension
-        if os.name == "nt":
-            return os.path.abspath(path)
-        if "CYGWIN" in os.environ:
-            result = subprocess.run(
-                ["cygpath", "-w", os.path.abspath(path)],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-            return result.stdout.strip()
-        if "WSL_DISTRO_NAME" in os.environ:
-            result = subprocess.run(
-                ["wslpath", "-w", os.path.abspath(path)],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-            return result.stdout.strip()
-        return os.path.abspath(path)
+        return _convert_path(os.path.abspath(path), _PATH_MODE)
 
     def convert_a0_mode(self, a0_mode):
         """
@@ -759,20 +1584,12 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             int: The numerical value of the mode.
         """
-        mode_map = {
-            "tristate": 0,
-            "0v": 1,
-            "1v": 2,
-            "2v": 3,
-            "3v": 4,
-            "3.3v": 5,
-            "dc": 6,
-        }
         if isinstance(a0_mode, str):
             a0_mode = a0_mode.lower()
-            if a0_mode in mode_map:
-                return mode_map[a0_mode]
-            raise ValueError(f"Invalid A0 mode: {a0_mode}")
+            try:
+                return _A0_MODE_MAP[a0_mode]
+            except KeyError:
+                raise ValueError(f"Invalid A0 mode: {a0_mode}") from None
         return a0_mode
 
     def convert_a1_mode(self, a1_mode):
@@ -785,24 +1602,12 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             int: The numerical value of the mode.
         """
-        mode_map = {
-            "tristate": 0,
-            "0v": 1,
-            "1v": 2,
-            "2v": 3,
-            "3v": 4,
-            "3.3v": 5,
-            "dc": 6,
-            "ramp": 7,
-            "sine": 8,
-            "square": 9,
-            "triangle": 10,
-        }
         if isinstance(a1_mode, str):
             a1_mode = a1_mode.lower()
-            if a1_mode in mode_map:
-                return mode_map[a1_mode]
-            raise ValueError(f"Invalid A1 mode: {a1_mode}")
+            try:
+                return _A1_MODE_MAP[a1_mode]
+            except KeyError:
+                raise ValueError(f"Invalid A1 mode: {a1_mode}") from None
         return a1_mode
 
     def convert_d0_mode(self, d0_mode):
@@ -815,12 +1620,12 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             int: The numerical value of the mode.
         """
-        mode_map = {"tristate": 0, "0v": 1, "3.3v": 2, "pwm": 3}
         if isinstance(d0_mode, str):
             d0_mode = d0_mode.lower()
-            if d0_mode in mode_map:
-                return mode_map[d0_mode]
-            raise ValueError(f"Invalid D0 mode: {d0_mode}")
+            try:
+                return _D0_MODE_MAP[d0_mode]
+            except KeyError:
+                raise ValueError(f"Invalid D0 mode: {d0_mode}") from None
         return d0_mode
 
     def convert_d1_mode(self, d1_mode):
@@ -833,212 +1638,352 @@ class ActiveProAPI:  # pylint: disable=too-many-public-methods
         Returns:
             int: The numerical value of the mode.
         """
-        mode_map = {"tristate": 0, "0v": 1, "3.3v": 2, "pwm": 3}
         if isinstance(d1_mode, str):
             d1_mode = d1_mode.lower()
-            if d1_mode in mode_map:
-                return mode_map[d1_mode]
-            raise ValueError(f"Invalid D1 mode: {d1_mode}")
+            try:
+                return _D1_MODE_MAP[d1_mode]
+            except KeyError:
+                raise ValueError(f"Invalid D1 mode: {d1_mode}") from None
         return d1_mode
 
 
-def run_demo(api_instance):  # pylint: disable=too-many-statements
+# pylint: disable-next=too-many-instance-attributes
+class AsyncActiveProAPI:
     """
-    Run a demonstration of the API.
+    An asyncio client of the Active-PRO application API.
+
+    The commands of concurrent tasks share the connection: each command is
+    written at once, and the responses, which come in order, are given
+    back to the tasks waiting for them.
 
     Args:
-        api_instance (ActiveProAPI): An instance of the ActiveProAPI class.
+        host (str): The host of the Active-PRO application.
+        port (int): The port of the Active-PRO application API.
+        connect_timeout (float): The seconds to wait for the connection,
+            None to wait as long as the system does.
+        command_timeout (float): The seconds to wait for sending commands
+            and receiving their responses, None to wait forever, for
+            instance for file commands, only answered once done.
     """
-    api_instance.hello()
-    api_instance.is_connected()
-    api_instance.show_inputs()
-    api_instance.show_list()
-    api_instance.show_settings()
-    api_instance.show_notes()
-    api_instance.show_outputs()
-    api_instance.close_tabs()
-    api_instance.set_d0_mode(0)
-    api_instance.set_d0_mode(1)
-    api_instance.set_d0_mode(2)
-    api_instance.set_d0_mode(3)
-    api_instance.set_d0_pwm(25)
-    api_instance.set_d0_pwm(75)
-    api_instance.set_d1_mode(0)
-    api_instance.set_d1_mode(1)
-    api_instance.set_d1_mode(2)
-    api_instance.set_d1_mode(3)
-    api_instance.set_d1_pwm(25)
-    api_instance.set_d1_pwm(75)
-    api_instance.set_a0_mode(0)
-    api_instance.set_a0_mode(1)
-    api_instance.set_a0_mode(2)
-    api_instance.set_a0_mode(3)
-    api_instance.set_a0_mode(4)
-    api_instance.set_a0_mode(5)
-    api_instance.set_a0_mode(6)
-    api_instance.set_a0_dc_level(0.5)
-    api_instance.set_a0_dc_level(1.5)
-    api_instance.set_a0_dc_level(2.5)
-    api_instance.set_a1_mode(1)
-    api_instance.set_a1_mode(2)
-    api_instance.set_a1_mode(3)
-    api_instance.set_a1_mode(4)
-    api_instance.set_a1_mode(6)
-    api_instance.set_a1_dc_level(0.5)
-    api_instance.set_a1_dc_level(1.5)
-    api_instance.set_a1_mode(7)
-    api_instance.set_a1_minimum(0.5)
-    api_instance.set_a1_maximum(2.5)
-    api_instance.set_a1_mode(8)
-    api_instance.set_a1_mode(9)
-    api_instance.set_a1_mode(10)
-    api_instance.set_a1_steps(4000)
-    api_instance.set_a1_steps(500)
-    api_instance.is_capturing()
-    api_instance.start_capture()
-    api_instance.get_logic()
-    api_instance.get_ch1()
-    api_instance.get_ch2()
-    api_instance.get_ch3()
-    api_instance.stop_capture()
-    api_instance.get_capture_size()
-    api_instance.get_capture_time()
-    api_instance.show_notes()
-    api_instance.clear_note()
-    api_instance.append_note("Sent to the Active-Pro Application.")
-    api_instance.append_note("")
-    api_instance.append_note("And here is more data.")
-    api_instance.zoom_all()
-    api_instance.zoom_from(1.0, 2.0)
-    api_instance.set_cursor_current(1)
-    api_instance.search("mon")
-    api_instance.search("booga")
-    api_instance.set_cursor_current(3)
-    api_instance.set_cursor_x1(0)
-    api_instance.set_cursor_x2(5.0)
-    api_instance.export_between_cursors("test")
-    api_instance.save_capture("testsave")
-    api_instance.save_between_cursors("testsavebetweencursors")
-    api_instance.save_configuration("testsaveconfig")
-    api_instance.open_configuration("testsaveconfig")
-    api_instance.save_screenshot("testclosed")
-    api_instance.new_capture()
-    api_instance.open_capture("testsave")
-    api_instance.exit()
 
+    def __init__(
+        self,
+        host="localhost",
+        port=37800,
+        connect_timeout=2.0,
+        command_timeout=5.0,
+    ):
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.command_timeout = command_timeout
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
+        # Futures of the commands sent, waiting for their response
+        self._pending = collections.deque()
 
-# pylint: disable=too-many-branches,too-many-locals
-def generate_bash_completion(argparser):
-    """
-    Generate a bash completion script for the API.
-    """
-    script_name = os.path.basename(__file__)
-    script_path = os.path.abspath(__file__)
+    async def __aenter__(self):
+        await self.connect()
+        return self
 
-    commands = []
-    one_arg_commands = []
-    two_arg_commands = []
-    file_commands = {}
-    choice_commands = {}
-
-    for action in argparser._actions:  # pylint: disable=protected-access
-        if action.option_strings:
-            command = " ".join(action.option_strings)
-
-            # For debug:
-            # if command == "--host":
-            #    print(f"# {command}-{action}")
-
-            # Determine nargs based on the given conditions
-            if action.nargs is not None:
-                nargs = action.nargs
-            elif action.metavar is None:
-                if action.type is not None:
-                    nargs = 1
-                else:
-                    nargs = 0
-            elif isinstance(action.metavar, str):
-                nargs = 1
-            elif isinstance(action.metavar, list):
-                nargs = len(action.metavar)
-            else:
-                nargs = 0  # Default case if none of the conditions match
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.disconnect()
 
-            if nargs == 0:
-                commands.append(command)
-            elif nargs == 1 or (
-                isinstance(action.metavar, str)
-                and not action.metavar.endswith("FILE")
-            ):
-                one_arg_commands.append(f"{command}")
-            elif nargs == 2:
-                two_arg_commands.append(f"{command}")
-
-            if (
-                action.metavar
-                and isinstance(action.metavar, str)
-                and action.metavar.endswith("FILE")
-            ):
-                file_commands[command] = action.metavar
-
-            if action.choices:
-                choice_commands[command] = action.choices
-
-    MAP_OPT_TO_EXTENSION = {
-        "--export-between-cursors": "csv",
-        "--save-capture": "active",
-        "--save-between-cursors": "active",
-        "--open-configuration": "active",
-        "--save-configuration": "active",
-        "--save-screenshot": "png",
-        "--open-capture": "active",
-    }
+    async def connect(self):
+        """
+        Connect to the Active-PRO application.
+        """
+        # asyncio is slow to import, only the asyncio client needs it
+        import asyncio  # pylint: disable=import-outside-toplevel
 
-    file_commands = {
-        cmd: MAP_OPT_TO_EXTENSION.get(cmd, "") for cmd in file_commands
-    }
+        # asyncio sets TCP_NODELAY on its TCP connections. Longer
+        # responses than the buffer limit are read in several parts.
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, limit=1 << 20),
+            self.connect_timeout,
+        )
+        self._reader_task = asyncio.get_running_loop().create_task(
+            self._read_responses()
+        )
 
-    extension_cases = " ".join(
-        [f"{cmd} ) ext={ext} ;;\n" for cmd, ext in file_commands.items()]
-    )
+    async def disconnect(self):
+        """
+        Disconnect from the Active-PRO application.
+        """
+        if self._writer is not None:
+            self._reader_task.cancel()
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            finally:
+                self._reader = self._writer = self._reader_task = None
+                self._fail_pending(
+                    ConnectionError("Disconnected from the application")
+                )
+
+    async def send_command(self, command):
+        """
+        Send a command to the Active-PRO application.
+
+        Args:
+            command (str or bytes): The command to send.
 
-    possible_ports = " ".join([str(port) for port in range(37800, 37810)])
+        Returns:
+            str: The response from the application.
+        """
+        return (await self.send_commands([command]))[0]
 
-    # Generate the code for the options with choices
-    choice_commands_str = "\n".join(
-        [
-            f'{cmd}) COMPREPLY=( $(compgen -W "'
-            f"{' '.join(choices)}"
-            '" -- ${{cur}}) );;'
-            for cmd, choices in choice_commands.items()
+    async def send_commands(self, commands):
+        """
+        Send several commands to the Active-PRO application at once.
+
+        Args:
+            commands (list): The commands (str or bytes) to send.
+
+        Returns:
+            list: The responses (str) from the application, in order.
+
+        Raises:
+            ValueError: A command contains a newline.
+            ConnectionError: Not connected, or the connection was lost.
+            ActiveProTimeout: The commands were not sent and answered
+                within command_timeout. The connection is closed, and
+                the commands of the other tasks fail as well.
+        """
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        if self._writer is None:
+            raise ConnectionError(
+                "Not connected to the Active-PRO application"
+            )
+        if self._reader_task.done() or self._writer.is_closing():
+            # No response would ever be read
+            raise ConnectionError(
+                "Connection to the Active-PRO application lost"
+            )
+        commands = [
+            command.encode() if isinstance(command, str) else command
+            for command in commands
         ]
-    )
+        if not commands:
+            return []
+        for command in commands:
+            if b"\n" in command:
+                raise ValueError(f"Newline in command: {command!r}")
+
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in commands]
+        # Queued in the order of writing, which is the order of the
+        # responses
+        self._pending.extend(futures)
+        self._writer.write(b"\n".join(commands) + b"\n")
+        try:
+            return await asyncio.wait_for(
+                self._exchange(futures), self.command_timeout
+            )
+        except asyncio.TimeoutError as e:
+            if isinstance(e, ActiveProTimeout):
+                # Failed by the timeout of another task
+                raise
+            error = ActiveProTimeout(
+                "No response from the Active-PRO application within "
+                f"{self.command_timeout}s"
+            )
+            # Out of sync: a late response would be taken for the next one
+            self._reader_task.cancel()
+            self._writer.close()
+            self._fail_pending(error)
+            raise error from None
+
+    async def _exchange(self, futures):
+        """
+        Send the commands written and wait for their responses.
+
+        Args:
+            futures (list): The futures of the commands.
+
+        Returns:
+            list: The responses (str) from the application, in order.
+        """
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        await self._writer.drain()
+        return list(await asyncio.gather(*futures))
+
+    async def _read_responses(self):
+        """
+        Give each response to the command waiting for it, until the
+        connection ends.
+        """
+        try:
+            while True:
+                line = await self._read_line()
+                future = self._pending.popleft()
+                # The sender may have been cancelled
+                if not future.done():
+                    future.set_result(line.decode().strip())
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            self._fail_pending(e)
+            # The later commands are refused by send_commands()
+            self._writer.close()
+
+    async def _read_line(self):
+        """
+        Read one response, of any length.
+
+        Returns:
+            bytes: The response with its newline.
+
+        Raises:
+            ConnectionError: The application closed the connection.
+        """
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        parts = []
+        while True:
+            try:
+                parts.append(await self._reader.readuntil(b"\n"))
+                return b"".join(parts)
+            except asyncio.LimitOverrunError as e:
+                # Longer than the buffer limit: take what is buffered
+                parts.append(await self._reader.readexactly(e.consumed))
+            except asyncio.IncompleteReadError:
+                raise ConnectionError(
+                    "Connection closed by the Active-PRO application"
+                ) from None
+
+    def _fail_pending(self, exception):
+        """
+        Fail the commands still waiting for a response.
+
+        Args:
+            exception (Exception): The reason.
+        """
+        while self._pending:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_exception(exception)
+
+
+def run_demo(api_instance):  # pylint: disable=too-many-statements
+    """
+    Run a demonstration of the API.
+
+    Args:
+        api_instance (ActiveProAPI): An instance of the ActiveProAPI class.
+    """
+    # Commands that do not depend on each other are pipelined to save
+    # round-trips.
+    with api_instance.pipeline():
+        api_instance.hello()
+        api_instance.is_connected()
+        api_instance.show_inputs()
+        api_instance.show_list()
+        api_instance.show_settings()
+        api_instance.show_notes()
+        api_instance.show_outputs()
+        api_instance.close_tabs()
+    with api_instance.pipeline():
+        for mode in range(4):
+            api_instance.set_d0_mode(mode)
+        for percent in (25, 75):
+            api_instance.set_d0_pwm(percent)
+        for mode in range(4):
+            api_instance.set_d1_mode(mode)
+        for percent in (25, 75):
+            api_instance.set_d1_pwm(percent)
+    with api_instance.pipeline():
+        for mode in range(7):
+            api_instance.set_a0_mode(mode)
+        for volts in (0.5, 1.5, 2.5):
+            api_instance.set_a0_dc_level(volts)
+    with api_instance.pipeline():
+        for mode in (1, 2, 3, 4, 6):
+            api_instance.set_a1_mode(mode)
+        for volts in (0.5, 1.5):
+            api_instance.set_a1_dc_level(volts)
+        api_instance.set_a1_mode(7)
+        api_instance.set_a1_minimum(0.5)
+        api_instance.set_a1_maximum(2.5)
+        for mode in (8, 9, 10):
+            api_instance.set_a1_mode(mode)
+        for steps in (4000, 500):
+            api_instance.set_a1_steps(steps)
+    api_instance.is_capturing()
+    with api_instance.pipeline():
+        api_instance.start_capture()
+        api_instance.get_logic()
+        api_instance.get_ch1()
+        api_instance.get_ch2()
+        api_instance.get_ch3()
+        api_instance.stop_capture()
+        api_instance.get_capture_size()
+        api_instance.get_capture_time()
+    with api_instance.pipeline():
+        api_instance.show_notes()
+        api_instance.clear_note()
+        api_instance.append_note("Sent to the Active-Pro Application.")
+        api_instance.append_note("")
+        api_instance.append_note("And here is more data.")
+        api_instance.zoom_all()
+        # The times are positive, nothing to resolve before sending
+        api_instance.zoom_from(1.0, 2.0)
+        api_instance.set_cursor_current(1)
+        api_instance.search("mon")
+        api_instance.search("booga")
+        api_instance.set_cursor_current(3)
+        api_instance.set_cursor_x1(0)
+        api_instance.set_cursor_x2(5.0)
+    with api_instance.pipeline():
+        api_instance.export_between_cursors("test")
+        api_instance.save_capture("testsave")
+        api_instance.save_between_cursors("testsavebetweencursors")
+        api_instance.save_configuration("testsaveconfig")
+        api_instance.open_configuration("testsaveconfig")
+        api_instance.save_screenshot("testclosed")
+        api_instance.new_capture()
+    api_instance.open_capture("testsave")
+    api_instance.exit()
+
 
-    completion_script = f"""
+# Default file extension of the file options, for the bash completion
+_FILE_EXTENSIONS = {
+    "--export-between-cursors": "csv",
+    "--save-capture": "active",
+    "--save-between-cursors": "active",
+    "--open-configuration": "active",
+    "--save-configuration": "active",
+    "--save-screenshot": "png",
+    "--open-capture": "active",
+}
+
+# Bash completion script, completed by generate_bash_completion()
+_BASH_COMPLETION_TEMPLATE = """
 _active_pro_api_completion() {{
     local cur prev words cword
     _init_completion || return
 
     local commands=(
-        {" ".join(commands)}
-        {" ".join(one_arg_commands)}
-        {" ".join(two_arg_commands)}
+        {commands}
+        {one_arg_commands}
+        {two_arg_commands}
     )
 
     local one_arg_commands=(
-        {" ".join(one_arg_commands)}
+        {one_arg_commands}
     )
 
     local two_arg_commands=(
-        {" ".join(two_arg_commands)}
+        {two_arg_commands}
     )
 
     local file_commands=(
-        {" ".join(file_commands.keys())}
+        {file_commands}
     )
 
     local choice_commands=(
-        {" ".join(choice_commands.keys())}
+        {choice_commands}
     )
 
     if [[ ${{#words[@]}} -ge 4 ]]; then
@@ -1052,7 +1997,7 @@ _active_pro_api_completion() {{
         prev=${{words[-2]}}
 
         case "$prev" in
-            {choice_commands_str}
+            {choice_cases}
         esac
 
         if [[ " ${{file_commands[*]}} " =~ " ${{prev}} " ]]; then
@@ -1092,494 +2037,594 @@ complete -F _active_pro_api_completion ./{script_name}
 complete -F _active_pro_api_completion {script_path}
 """
 
-    print(completion_script)
 
+@functools.lru_cache(maxsize=1)
+def _bash_completion_script():
+    """
+    Build the bash completion script, once as it only depends on the
+    command line options.
 
-# Demonstration code
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="ActivePro API Client")
-    parser.add_argument(
-        "--demo", action="store_true", help="Run the demonstration code"
-    )
-    parser.add_argument(
-        "--export-between-cursors",
-        metavar="FILE",
-        help="Export data between cursors to a file",
-    )
-    parser.add_argument(
-        "--save-capture", metavar="FILE", help="Save capture to a file"
-    )
-    parser.add_argument(
-        "--save-between-cursors",
-        metavar="FILE",
-        help="Save data between cursors to a file",
-    )
-    parser.add_argument(
-        "--open-configuration",
-        metavar="FILE",
-        help="Open configuration from a file",
-    )
-    parser.add_argument(
-        "--save-configuration",
-        metavar="FILE",
-        help="Save configuration to a file",
-    )
-    parser.add_argument(
-        "--save-screenshot", metavar="FILE", help="Save screenshot to a file"
-    )
-    parser.add_argument(
-        "--open-capture", metavar="FILE", help="Open capture from a file"
-    )
-    parser.add_argument(
-        "--generate-bash-completion",
-        action="store_true",
-        help=f"Generate bash completion script. To use, source the output of "
-        f"this command in your shell: source <({sys.argv[0]} "
-        "--generate-bash-completion)",
-    )
-    parser.add_argument(
-        "--set-d0-mode",
-        metavar="PARAM",
-        type=str.upper,  # Convert input to uppercase
-        choices=["0", "1", "2", "3", "TRISTATE", "0V", "3.3V", "PWM"],
-        help="Set D0 mode (0=TRISTATE, 1=0V, 2=3.3V, 3=PWM)",
-    )
-    parser.add_argument(
-        "--set-d0-pwm", metavar="PERCENT", type=int, help="Set D0 PWM"
-    )
-    parser.add_argument(
-        "--set-d1-mode",
-        metavar="PARAM",
-        type=str.upper,  # Convert input to uppercase
-        choices=["0", "1", "2", "3", "TRISTATE", "0V", "3.3V", "PWM"],
-        help="Set D1 mode (0=TRISTATE, 1=0V, 2=3.3V, 3=PWM)",
-    )
-    parser.add_argument(
-        "--set-d1-pwm", metavar="PERCENT", type=int, help="Set D1 PWM"
-    )
-    parser.add_argument(
-        "--set-a0-mode",
-        metavar="PARAM",
-        type=str,
-        choices=[
-            "0",
-            "1",
-            "2",
-            "3",
-            "4",
-            "5",
-            "6",
-            "TRISTATE",
-            "0V",
-            "1V",
-            "2V",
-            "3V",
-            "3.3V",
-            "DC",
-        ],
-        help="Set A0 mode (0=TRISTATE, 1=0V, 2=1V, 3=2V, 4=3V, 5=3.3V, 6=DC)",
-    )
-    parser.add_argument(
-        "--set-a0-dc-level",
-        metavar="VOLTS",
-        type=float,
-        help="Set A0 DC level",
-    )
-    parser.add_argument(
-        "--set-a1-mode",
-        metavar="PARAM",
-        type=str,
-        choices=[
-            "0",
-            "1",
-            "2",
-            "3",
-            "4",
-            "5",
-            "6",
-            "7",
-            "8",
-            "9",
-            "10",
-            "TRISTATE",
-            "0V",
-            "1V",
-            "2V",
-            "3V",
-            "3.3V",
-            "DC",
-            "RAMP",
-            "SINE",
-            "SQUARE",
-            "TRIANGLE",
-        ],
-        help=(
-            "Set A1 mode (0=TRISTATE, 1=0V, 2=1V, 3=2V, 4=3V, 5=3.3V, 6=DC, "
-            "7=RAMP, 8=SINE, 9=SQUARE, 10=TRIANGLE)"
-        ),
-    )
-    parser.add_argument(
-        "--set-a1-dc-level",
-        metavar="VOLTS",
-        type=float,
-        help="Set A1 DC level",
-    )
-    parser.add_argument(
-        "--set-a1-minimum", metavar="VOLTS", type=float, help="Set A1 minimum"
-    )
-    parser.add_argument(
-        "--set-a1-maximum", metavar="VOLTS", type=float, help="Set A1 maximum"
-    )
-    parser.add_argument(
-        "--set-a1-steps", metavar="STEPS", type=int, help="Set A1 steps"
-    )
-    parser.add_argument("--append-note", metavar="STRING", help="Append note")
-    parser.add_argument(
-        "--set-cursor-current",
-        metavar="TIME",
-        type=float,
-        help="Set cursor current",
-    )
-    parser.add_argument(
-        "--set-cursor-x1", metavar="TIME", type=float, help="Set cursor X1"
-    )
-    parser.add_argument(
-        "--set-cursor-x2", metavar="TIME", type=float, help="Set cursor X2"
-    )
-    parser.add_argument(
-        "--zoom-from",
-        metavar=("START", "END"),
-        type=float,
-        nargs=2,
-        help="Zoom from start to end",
-    )
-    parser.add_argument(
-        "--zoom-range",
-        metavar=("START", "END"),
-        type=float,
-        nargs=2,
-        help="Zoom from start to end (same as --zoom-from)",
-    )
-    # Not implemented, so commented
-    # parser.add_argument(
-    #    "--zoom-cursors",
-    #    action="store_true",
-    #    help="Zoom between the X1 and X2 cursors",
-    # )
-    parser.add_argument("--search", metavar="STRING", help="Search")
-    parser.add_argument(
-        "--quiet", "-q", action="store_true", help="Disable verbosity"
-    )
-    parser.add_argument(
-        "--get-capture-size", action="store_true", help="Get capture size"
-    )
-    parser.add_argument(
-        "--get-capture-time", action="store_true", help="Get capture time"
-    )
-    parser.add_argument("--get-logic", action="store_true", help="Get logic")
-    parser.add_argument("--get-ch1", action="store_true", help="Get channel 1")
-    parser.add_argument("--get-ch2", action="store_true", help="Get channel 2")
-    parser.add_argument("--get-ch3", action="store_true", help="Get channel 3")
-    parser.add_argument(
-        "--hello", action="store_true", help="Send hello command"
-    )
-    parser.add_argument(
-        "--is-connected", action="store_true", help="Check if connected"
-    )
-    parser.add_argument(
-        "--start-capture", action="store_true", help="Start capture"
-    )
-    parser.add_argument(
-        "--stop-capture", action="store_true", help="Stop capture"
-    )
-    parser.add_argument(
-        "--is-capturing", action="store_true", help="Check if capturing"
-    )
-    parser.add_argument("--clear-note", action="store_true", help="Clear note")
-    parser.add_argument("--zoom-all", action="store_true", help="Zoom all")
-    parser.add_argument(
-        "--show-inputs", action="store_true", help="Show inputs"
-    )
-    parser.add_argument(
-        "--show-outputs", action="store_true", help="Show outputs"
-    )
-    parser.add_argument("--show-list", action="store_true", help="Show list")
-    parser.add_argument(
-        "--show-settings", action="store_true", help="Show settings"
-    )
-    parser.add_argument("--show-notes", action="store_true", help="Show notes")
-    parser.add_argument("--close-tabs", action="store_true", help="Close tabs")
-    parser.add_argument(
-        "--new-capture", action="store_true", help="New capture"
-    )
-    parser.add_argument("--exit", action="store_true", help="Exit")
-    parser.add_argument(
-        "--not-capturing",
-        action="store_true",
-        help="Exit immediately if the session is capturing",
-    )
-    parser.add_argument("--port", type=int, help="Set the port number")
-    parser.add_argument(
-        "--id",
-        type=int,
-        help="Select ActiveProDebugger based on 'id'. Use -1 to auto-detect.",
-    )
-    parser.add_argument(
-        "--host",
-        type=str,
-        default="localhost",
-        help="Set the host address (default is 'localhost')",
-    )
-    parsed_args = parser.parse_args()
+    Returns:
+        str: The bash completion script.
+    """
+    # argparse adds the help option
+    specs = [(("-h", "--help"), {"action": "help"})] + ARG_SPECS
 
-    if parsed_args.generate_bash_completion:
-        generate_bash_completion(parser)
-        sys.exit(0)
+    commands = []
+    one_arg_commands = []
+    two_arg_commands = []
+    file_commands = []
+    choice_commands = []
+    choice_cases = []
+
+    for flags, kwargs in specs:
+        command = " ".join(flags)
+        metavar = kwargs.get("metavar")
+        if kwargs.get("action") in ("help", "store_true"):
+            commands.append(command)
+        elif kwargs.get("nargs", 1) == 1:
+            one_arg_commands.append(command)
+        else:
+            two_arg_commands.append(command)
 
-    # Check if at least one argument is provided
-    if len(sys.argv) == 1:
-        parser.print_help()
-        logger.log(logging.ERROR, "At least one argument is needed")
-        sys.exit(1)
+        if isinstance(metavar, str) and metavar.endswith("FILE"):
+            file_commands.append(command)
 
-    try:
-        # Instantiate api outside of the conditional blocks
-        api = ActiveProAPI(
-            host=parsed_args.host,
-            verbose=(
-                VerboseLevel.RESULT if parsed_args.quiet else VerboseLevel.INFO
-            ),
+        # The mode types know their valid values
+        choices = kwargs.get("choices") or getattr(
+            kwargs.get("type"), "choices", None
         )
-
-        if parsed_args.id is not None and parsed_args.port is not None:
-            logger.log(
-                logging.ERROR,
-                "Error: --id and --port cannot be used simultaneously.",
+        if choices:
+            choice_commands.append(command)
+            choice_cases.append(
+                f'{command}) COMPREPLY=( $(compgen -W "'
+                f"{' '.join(choices)}"
+                '" -- ${cur}) );;'
             )
-            sys.exit(1)
-
-        if parsed_args.id is not None:
-            if parsed_args.id == -1:
-                available_ports = api.find_available_ports()
-                if not available_ports:
-                    logger.log(
-                        logging.ERROR, "Error: No available ports found."
-                    )
-                    sys.exit(1)
-                selected_port = max(available_ports.values())
-                api = ActiveProAPI(
-                    host=parsed_args.host,
-                    port=selected_port,
-                    verbose=(
-                        VerboseLevel.RESULT
-                        if parsed_args.quiet
-                        else VerboseLevel.INFO
-                    ),
-                )
-            else:
-                selected_port = 37800 + parsed_args.id - 1
-                api = ActiveProAPI(
-                    host=parsed_args.host,
-                    port=selected_port,
-                    verbose=(
-                        VerboseLevel.RESULT
-                        if parsed_args.quiet
-                        else VerboseLevel.INFO
-                    ),
-                )
-        elif parsed_args.port is not None:
-            api = ActiveProAPI(
-                host=parsed_args.host,
-                port=parsed_args.port,
-                verbose=(
-                    VerboseLevel.RESULT
-                    if parsed_args.quiet
-                    else VerboseLevel.INFO
-                ),
-            )
-
-        api.connect()
-
-        if parsed_args.not_capturing:
-            if api.is_capturing():
-                logger.log(logging.INFO, "Session is capturing. Exiting.")
-                sys.exit(0)
-
-        if parsed_args.demo:
-            run_demo(api)
-
-        # Save old configuration first before loading configurations
-        if parsed_args.save_configuration:
-            api.save_configuration(parsed_args.save_configuration)
-
-        # Arguments that impact configuration
-
-        if parsed_args.append_note is not None:
-            api.append_note(parsed_args.append_note)
-
-        if parsed_args.set_cursor_current is not None:
-            api.set_cursor_current(parsed_args.set_cursor_current)
-
-        if parsed_args.set_cursor_x1 is not None:
-            api.set_cursor_x1(parsed_args.set_cursor_x1)
-
-        if parsed_args.set_cursor_x2 is not None:
-            api.set_cursor_x2(parsed_args.set_cursor_x2)
-
-        if parsed_args.zoom_from is not None:
-            api.zoom_from(parsed_args.zoom_from[0], parsed_args.zoom_from[1])
-
-        if parsed_args.zoom_range is not None:
-            api.zoom_from(parsed_args.zoom_range[0], parsed_args.zoom_range[1])
-
-        # Can't read position of cursors, so can't zoom to cursors
-        # if parsed_args.zoom_cursors:
-        #     api.zoom_cursors()
-
-        if parsed_args.search is not None:
-            api.search(parsed_args.search)
 
-        if parsed_args.get_capture_size:
-            api.get_capture_size()
-
-        if parsed_args.get_capture_time:
-            api.get_capture_time()
-
-        if parsed_args.get_logic:
-            api.get_logic()
-
-        if parsed_args.get_ch1:
-            api.get_ch1()
-
-        if parsed_args.get_ch2:
-            api.get_ch2()
+    return _BASH_COMPLETION_TEMPLATE.format(
+        commands=" ".join(commands),
+        one_arg_commands=" ".join(one_arg_commands),
+        two_arg_commands=" ".join(two_arg_commands),
+        file_commands=" ".join(file_commands),
+        choice_commands=" ".join(choice_commands),
+        choice_cases="\n".join(choice_cases),
+        extension_cases=" ".join(
+            f"{cmd} ) ext={_FILE_EXTENSIONS.get(cmd, '')} ;;\n"
+            for cmd in file_commands
+        ),
+        possible_ports=" ".join(str(port) for port in range(37800, 37810)),
+        script_name=os.path.basename(__file__),
+        script_path=os.path.abspath(__file__),
+    )
 
-        if parsed_args.get_ch3:
-            api.get_ch3()
 
-        # Save operations first before loading configurations or restart
-        if parsed_args.save_capture:
-            api.save_capture(parsed_args.save_capture)
+def generate_bash_completion():
+    """
+    Generate a bash completion script for the API.
+    """
+    sys.stdout.write(_bash_completion_script() + "\n")
 
-        if parsed_args.save_between_cursors:
-            api.save_between_cursors(parsed_args.save_between_cursors)
 
-        if parsed_args.export_between_cursors:
-            api.export_between_cursors(parsed_args.export_between_cursors)
+def _mode_type(output, mode_map):
+    """
+    Build the type of a mode option, converting a mode name (in any
+    case) or number to the number of the mode.
 
-        if parsed_args.save_configuration:
-            api.save_configuration(parsed_args.save_configuration)
+    Args:
+        output (str): The output, e.g. "D0", for the error messages.
+        mode_map (Mapping): The numbers of the modes, by lowercase name.
 
-        if parsed_args.save_screenshot:
-            api.save_screenshot(parsed_args.save_screenshot)
+    Returns:
+        function: The type, its choices attribute lists the valid values.
+    """
+    numbers = sorted(set(mode_map.values()))
+    modes = {str(number): number for number in numbers}
+    modes.update((name.upper(), number) for name, number in mode_map.items())
+
+    def mode_type(value):
+        try:
+            return modes[value.upper()]
+        except KeyError:
+            raise ValueError(f"Invalid {output} mode: {value}") from None
+
+    # Named in the argparse error messages
+    mode_type.__name__ = f"{output} mode"
+    mode_type.choices = tuple(modes)
+    return mode_type
+
+
+# Command line options: (flags, keyword arguments of add_argument)
+ARG_SPECS = [
+    (
+        ("--demo",),
+        {"action": "store_true", "help": "Run the demonstration code"},
+    ),
+    (
+        ("--export-between-cursors",),
+        {"metavar": "FILE", "help": "Export data between cursors to a file"},
+    ),
+    (
+        ("--save-capture",),
+        {"metavar": "FILE", "help": "Save capture to a file"},
+    ),
+    (
+        ("--save-between-cursors",),
+        {"metavar": "FILE", "help": "Save data between cursors to a file"},
+    ),
+    (
+        ("--open-configuration",),
+        {"metavar": "FILE", "help": "Open configuration from a file"},
+    ),
+    (
+        ("--save-configuration",),
+        {"metavar": "FILE", "help": "Save configuration to a file"},
+    ),
+    (
+        ("--save-screenshot",),
+        {"metavar": "FILE", "help": "Save screenshot to a file"},
+    ),
+    (
+        ("--open-capture",),
+        {"metavar": "FILE", "help": "Open capture from a file"},
+    ),
+    (
+        ("--generate-bash-completion",),
+        {
+            "action": "store_true",
+            "help": (
+                "Generate bash completion script. To use, source the "
+                "output of this command in your shell: "
+                f"source <({sys.argv[0]} --generate-bash-completion)"
+            ),
+        },
+    ),
+    (
+        ("--set-d0-mode",),
+        {
+            "metavar": "PARAM",
+            "type": _mode_type("D0", _D0_MODE_MAP),
+            "help": "Set D0 mode (0=TRISTATE, 1=0V, 2=3.3V, 3=PWM)",
+        },
+    ),
+    (
+        ("--set-d0-pwm",),
+        {"metavar": "PERCENT", "type": int, "help": "Set D0 PWM"},
+    ),
+    (
+        ("--set-d1-mode",),
+        {
+            "metavar": "PARAM",
+            "type": _mode_type("D1", _D1_MODE_MAP),
+            "help": "Set D1 mode (0=TRISTATE, 1=0V, 2=3.3V, 3=PWM)",
+        },
+    ),
+    (
+        ("--set-d1-pwm",),
+        {"metavar": "PERCENT", "type": int, "help": "Set D1 PWM"},
+    ),
+    (
+        ("--set-a0-mode",),
+        {
+            "metavar": "PARAM",
+            "type": _mode_type("A0", _A0_MODE_MAP),
+            "help": (
+                "Set A0 mode (0=TRISTATE, 1=0V, 2=1V, 3=2V, 4=3V, 5=3.3V, "
+                "6=DC)"
+            ),
+        },
+    ),
+    (
+        ("--set-a0-dc-level",),
+        {"metavar": "VOLTS", "type": float, "help": "Set A0 DC level"},
+    ),
+    (
+        ("--set-a1-mode",),
+        {
+            "metavar": "PARAM",
+            "type": _mode_type("A1", _A1_MODE_MAP),
+            "help": (
+                "Set A1 mode (0=TRISTATE, 1=0V, 2=1V, 3=2V, 4=3V, 5=3.3V, "
+                "6=DC, 7=RAMP, 8=SINE, 9=SQUARE, 10=TRIANGLE)"
+            ),
+        },
+    ),
+    (
+        ("--set-a1-dc-level",),
+        {"metavar": "VOLTS", "type": float, "help": "Set A1 DC level"},
+    ),
+    (
+        ("--set-a1-minimum",),
+        {"metavar": "VOLTS", "type": float, "help": "Set A1 minimum"},
+    ),
+    (
+        ("--set-a1-maximum",),
+        {"metavar": "VOLTS", "type": float, "help": "Set A1 maximum"},
+    ),
+    (
+        ("--set-a1-steps",),
+        {"metavar": "STEPS", "type": int, "help": "Set A1 steps"},
+    ),
+    (("--append-note",), {"metavar": "STRING", "help": "Append note"}),
+    (
+        ("--set-cursor-current",),
+        {"metavar": "TIME", "type": float, "help": "Set cursor current"},
+    ),
+    (
+        ("--set-cursor-x1",),
+        {"metavar": "TIME", "type": float, "help": "Set cursor X1"},
+    ),
+    (
+        ("--set-cursor-x2",),
+        {"metavar": "TIME", "type": float, "help": "Set cursor X2"},
+    ),
+    (
+        ("--zoom-from",),
+        {
+            "metavar": ("START", "END"),
+            "type": float,
+            "nargs": 2,
+            "help": "Zoom from start to end",
+        },
+    ),
+    (
+        ("--zoom-range",),
+        {
+            "metavar": ("START", "END"),
+            "type": float,
+            "nargs": 2,
+            "help": "Zoom from start to end (same as --zoom-from)",
+        },
+    ),
+    # Not implemented, so commented
+    # (
+    #    ("--zoom-cursors",),
+    #    {
+    #        "action": "store_true",
+    #        "help": "Zoom between the X1 and X2 cursors",
+    #    },
+    # ),
+    (("--search",), {"metavar": "STRING", "help": "Search"}),
+    (
+        (
+            "--quiet",
+            "-q",
+        ),
+        {"action": "store_true", "help": "Disable verbosity"},
+    ),
+    (
+        ("--get-capture-size",),
+        {"action": "store_true", "help": "Get capture size"},
+    ),
+    (
+        ("--get-capture-time",),
+        {"action": "store_true", "help": "Get capture time"},
+    ),
+    (("--get-logic",), {"action": "store_true", "help": "Get logic"}),
+    (("--get-ch1",), {"action": "store_true", "help": "Get channel 1"}),
+    (("--get-ch2",), {"action": "store_true", "help": "Get channel 2"}),
+    (("--get-ch3",), {"action": "store_true", "help": "Get channel 3"}),
+    (("--hello",), {"action": "store_true", "help": "Send hello command"}),
+    (
+        ("--is-connected",),
+        {"action": "store_true", "help": "Check if connected"},
+    ),
+    (("--start-capture",), {"action": "store_true", "help": "Start capture"}),
+    (("--stop-capture",), {"action": "store_true", "help": "Stop capture"}),
+    (
+        ("--is-capturing",),
+        {"action": "store_true", "help": "Check if capturing"},
+    ),
+    (("--clear-note",), {"action": "store_true", "help": "Clear note"}),
+    (("--zoom-all",), {"action": "store_true", "help": "Zoom all"}),
+    (("--show-inputs",), {"action": "store_true", "help": "Show inputs"}),
+    (("--show-outputs",), {"action": "store_true", "help": "Show outputs"}),
+    (("--show-list",), {"action": "store_true", "help": "Show list"}),
+    (("--show-settings",), {"action": "store_true", "help": "Show settings"}),
+    (("--show-notes",), {"action": "store_true", "help": "Show notes"}),
+    (("--close-tabs",), {"action": "store_true", "help": "Close tabs"}),
+    (("--new-capture",), {"action": "store_true", "help": "New capture"}),
+    (("--exit",), {"action": "store_true", "help": "Exit"}),
+    (
+        ("--not-capturing",),
+        {
+            "action": "store_true",
+            "help": "Exit immediately if the session is capturing",
+        },
+    ),
+    (("--port",), {"type": int, "help": "Set the port number"}),
+    (
+        ("--id",),
+        {
+            "type": int,
+            "help": (
+                "Select ActiveProDebugger based on 'id'. "
+                "Use -1 to auto-detect."
+            ),
+        },
+    ),
+    (
+        ("--host",),
+        {
+            "type": str,
+            "default": "localhost",
+            "help": "Set the host address (default is 'localhost')",
+        },
+    ),
+    (
+        ("--connect-timeout",),
+        {
+            "type": float,
+            "default": 2.0,
+            "metavar": "SECONDS",
+            "help": "Set the connection timeout in seconds (default is 2.0)",
+        },
+    ),
+    (
+        ("--command-timeout",),
+        {
+            "type": float,
+            "default": 5.0,
+            "metavar": "SECONDS",
+            "help": (
+                "Set the timeout in seconds of the commands other than the "
+                "file commands, which wait until done (default is 5.0)"
+            ),
+        },
+    ),
+]
+
+
+# Actions of the command line options, in execution order:
+# (option attribute, ActiveProAPI method, number of method arguments)
+DISPATCH = [
+    # Arguments that impact configuration
+    ("append_note", "append_note", 1),
+    ("set_cursor_current", "set_cursor_current", 1),
+    ("set_cursor_x1", "set_cursor_x1", 1),
+    ("set_cursor_x2", "set_cursor_x2", 1),
+    ("zoom_from", "zoom_from", 2),
+    ("zoom_range", "zoom_from", 2),
+    # Can't read position of cursors, so can't zoom to cursors
+    # ("zoom_cursors", "zoom_cursors", 0),
+    ("search", "search", 1),
+    ("get_capture_size", "get_capture_size", 0),
+    ("get_capture_time", "get_capture_time", 0),
+    ("get_logic", "get_logic", 0),
+    ("get_ch1", "get_ch1", 0),
+    ("get_ch2", "get_ch2", 0),
+    ("get_ch3", "get_ch3", 0),
+    # Save operations first before loading configurations or restart.
+    # Each action runs once: the configuration is saved here, with the
+    # changes made by the options above.
+    ("save_capture", "save_capture", 1),
+    ("save_between_cursors", "save_between_cursors", 1),
+    ("export_between_cursors", "export_between_cursors", 1),
+    ("save_configuration", "save_configuration", 1),
+    ("save_screenshot", "save_screenshot", 1),
+    # Read/Open operations next
+    ("open_configuration", "open_configuration", 1),
+    ("open_capture", "open_capture", 1),
+    # Configuration operations
+    ("set_d0_mode", "set_d0_mode", 1),
+    ("set_d0_pwm", "set_d0_pwm", 1),
+    ("set_d1_mode", "set_d1_mode", 1),
+    ("set_d1_pwm", "set_d1_pwm", 1),
+    ("set_a0_mode", "set_a0_mode", 1),
+    ("set_a0_dc_level", "set_a0_dc_level", 1),
+    ("set_a1_mode", "set_a1_mode", 1),
+    ("set_a1_dc_level", "set_a1_dc_level", 1),
+    ("set_a1_minimum", "set_a1_minimum", 1),
+    ("set_a1_maximum", "set_a1_maximum", 1),
+    ("set_a1_steps", "set_a1_steps", 1),
+    ("hello", "hello", 0),
+    ("is_connected", "is_connected", 0),
+    ("start_capture", "start_capture", 0),
+    ("stop_capture", "stop_capture", 0),
+    ("is_capturing", "is_capturing", 0),
+    ("clear_note", "clear_note", 0),
+    ("zoom_all", "zoom_all", 0),
+    ("show_inputs", "show_inputs", 0),
+    ("show_outputs", "show_outputs", 0),
+    ("show_list", "show_list", 0),
+    ("show_settings", "show_settings", 0),
+    ("show_notes", "show_notes", 0),
+    ("close_tabs", "close_tabs", 0),
+    ("new_capture", "new_capture", 0),
+    ("exit", "exit", 0),
+]
+
+# ActiveProAPI methods of DISPATCH whose result is not needed, run in a
+# pipeline when consecutive: the responses are output when read.
+# open_capture needs the response of is_capturing, and exit closes the
+# application.
+PIPELINED = frozenset(
+    method_name
+    for _, method_name, _ in DISPATCH
+    if method_name not in ("open_capture", "exit")
+)
+
+
+def _build_parser():
+    """
+    Build the command line parser from ARG_SPECS.
 
-        # Read/Open operations next
-        if parsed_args.open_configuration:
-            api.open_configuration(parsed_args.open_configuration)
+    Returns:
+        argparse.ArgumentParser: The command line parser.
+    """
+    # argparse is only needed for the help, the bash completion and to
+    # report errors, so it is only imported when building the parser.
+    import argparse  # pylint: disable=import-outside-toplevel
 
-        if parsed_args.open_capture:
-            api.open_capture(parsed_args.open_capture)
+    argparser = argparse.ArgumentParser(description="ActivePro API Client")
+    for flags, kwargs in ARG_SPECS:
+        argparser.add_argument(*flags, **kwargs)
+    return argparser
 
-        # Configuration operations
-        if parsed_args.set_d0_mode is not None:
-            try:
-                mode = api.convert_d0_mode(parsed_args.set_d0_mode)
-                api.set_d0_mode(mode)
-            except ValueError as e:
-                logger.log(logging.ERROR, str(e))
-                sys.exit(1)
 
-        if parsed_args.set_d0_pwm is not None:
-            api.set_d0_pwm(parsed_args.set_d0_pwm)
+# Like argparse, values looking like negative numbers are not options
+_NEGATIVE_NUMBER = re.compile(r"^-\d+$|^-\d*\.\d+$")
 
-        if parsed_args.set_d1_mode is not None:
-            try:
-                mode = api.convert_d1_mode(parsed_args.set_d1_mode)
-                api.set_d1_mode(mode)
-            except ValueError as e:
-                logger.log(logging.ERROR, str(e))
-                sys.exit(1)
 
-        if parsed_args.set_d1_pwm is not None:
-            api.set_d1_pwm(parsed_args.set_d1_pwm)
+# pylint: disable-next=too-many-branches,too-many-return-statements
+def _fast_parse(argv):
+    """
+    Parse the command line from ARG_SPECS without argparse.
 
-        if parsed_args.set_a0_mode is not None:
-            try:
-                mode = api.convert_a0_mode(parsed_args.set_a0_mode)
-                api.set_a0_mode(mode)
-            except ValueError as e:
-                logger.log(logging.ERROR, str(e))
-                sys.exit(1)
+    Only exact option names with valid values are handled. Anything else
+    (--help, abbreviations, invalid values, ...) is left to argparse.
 
-        if parsed_args.set_a0_dc_level is not None:
-            api.set_a0_dc_level(parsed_args.set_a0_dc_level)
+    Args:
+        argv (list): The command line arguments, without the program name.
 
-        if parsed_args.set_a1_mode is not None:
+    Returns:
+        types.SimpleNamespace: The parsed options, or None when argparse
+        has to parse the command line.
+    """
+    options = {}
+    values = {}
+    for flags, kwargs in ARG_SPECS:
+        dest = flags[0].lstrip("-").replace("-", "_")
+        if kwargs.get("action") == "store_true":
+            values[dest] = False
+            nargs = 0
+        else:
+            values[dest] = kwargs.get("default")
+            nargs = kwargs.get("nargs")
+        for flag in flags:
+            options[flag] = (dest, nargs, kwargs)
+
+    index = 0
+    while index < len(argv):
+        flag, explicit, value = argv[index].partition("=")
+        index += 1
+        if flag not in options or (explicit and not flag.startswith("--")):
+            return None
+        dest, nargs, kwargs = options[flag]
+        if nargs == 0:
+            if explicit:
+                return None
+            values[dest] = True
+            continue
+        if explicit:
+            if nargs is not None:
+                return None
+            args = [value]
+        else:
+            count = nargs or 1
+            args = argv[index:][:count]
+            index += count
+            if len(args) < count or any(
+                arg.startswith("-") and not _NEGATIVE_NUMBER.match(arg)
+                for arg in args
+            ):
+                return None
+        if "type" in kwargs:
             try:
-                mode = api.convert_a1_mode(parsed_args.set_a1_mode)
-                api.set_a1_mode(mode)
-            except ValueError as e:
-                logger.log(logging.ERROR, str(e))
-                sys.exit(1)
-
-        if parsed_args.set_a1_dc_level is not None:
-            api.set_a1_dc_level(parsed_args.set_a1_dc_level)
-
-        if parsed_args.set_a1_minimum is not None:
-            api.set_a1_minimum(parsed_args.set_a1_minimum)
-
-        if parsed_args.set_a1_maximum is not None:
-            api.set_a1_maximum(parsed_args.set_a1_maximum)
-
-        if parsed_args.set_a1_steps is not None:
-            api.set_a1_steps(parsed_args.set_a1_steps)
+                args = [kwargs["type"](arg) for arg in args]
+            except (TypeError, ValueError):
+                return None
+        if "choices" in kwargs and any(
+            arg not in kwargs["choices"] for arg in args
+        ):
+            return None
+        values[dest] = args if nargs else args[0]
+    return types.SimpleNamespace(**values)
 
-        if parsed_args.hello:
-            api.hello()
 
-        if parsed_args.is_connected:
-            api.is_connected()
+def _exit_success():
+    """
+    Exit at once once the output is complete, without the cleanup of the
+    interpreter.
+    """
+    sys.stdout.flush()
+    logging.shutdown()
+    os._exit(0)
 
-        if parsed_args.start_capture:
-            api.start_capture()
 
-        if parsed_args.stop_capture:
-            api.stop_capture()
+# Demonstration code
+if __name__ == "__main__":
+    parsed_args = _fast_parse(sys.argv[1:])
+    if parsed_args is None:
+        # Let argparse show the help or report the errors
+        parsed_args = _build_parser().parse_args()
 
-        if parsed_args.is_capturing:
-            api.is_capturing()
+    if parsed_args.quiet:
+        # Only the results and the errors are output
+        logger.setLevel(logging.WARNING)
 
-        if parsed_args.clear_note:
-            api.clear_note()
+    if parsed_args.generate_bash_completion:
+        generate_bash_completion()
+        _exit_success()
 
-        if parsed_args.zoom_all:
-            api.zoom_all()
+    # Check if at least one argument is provided
+    if len(sys.argv) == 1:
+        _build_parser().print_help()
+        logger.error("At least one argument is needed")
+        sys.exit(1)
 
-        if parsed_args.show_inputs:
-            api.show_inputs()
+    try:
+        api = ActiveProAPI(
+            host=parsed_args.host,
+            verbose=(
+                VerboseLevel.RESULT if parsed_args.quiet else VerboseLevel.INFO
+            ),
+            connect_timeout=parsed_args.connect_timeout,
+            command_timeout=parsed_args.command_timeout,
+        )
 
-        if parsed_args.show_outputs:
-            api.show_outputs()
+        if parsed_args.id is not None and parsed_args.port is not None:
+            logger.error(
+                "Error: --id and --port cannot be used simultaneously."
+            )
+            sys.exit(1)
 
-        if parsed_args.show_list:
-            api.show_list()
+        # Select the port before connecting
+        if parsed_args.id == -1:
+            available_ports = api.find_available_ports()
+            if not available_ports:
+                logger.error("Error: No available ports found.")
+                sys.exit(1)
+            api.port = max(available_ports.values())
+        elif parsed_args.id is not None:
+            api.port = 37800 + parsed_args.id - 1
+        elif parsed_args.port is not None:
+            api.port = parsed_args.port
 
-        if parsed_args.show_settings:
-            api.show_settings()
+        api.connect()
 
-        if parsed_args.show_notes:
-            api.show_notes()
+        if parsed_args.not_capturing:
+            if api.is_capturing():
+                logger.info("Session is capturing. Exiting.")
+                api.disconnect()
+                _exit_success()
 
-        if parsed_args.close_tabs:
-            api.close_tabs()
+        if parsed_args.demo:
+            run_demo(api)
 
-        if parsed_args.new_capture:
-            api.new_capture()
+        option_values = vars(parsed_args)
+        actions = []
+        for option, method_name, arity in DISPATCH:
+            option_value = option_values[option]
+            if option_value is None or option_value is False:
+                continue
+            if arity == 0:
+                option_args = ()
+            elif arity == 1:
+                option_args = (option_value,)
+            else:
+                option_args = tuple(option_value)
+            actions.append((method_name, option_args))
 
-        if parsed_args.exit:
-            api.exit()
+        # Consecutive queries are sent together
+        for pipelined, group in itertools.groupby(
+            actions, key=lambda action: action[0] in PIPELINED
+        ):
+            with api.pipeline() if pipelined else contextlib.nullcontext():
+                for method_name, option_args in group:
+                    getattr(api, method_name)(*option_args)
 
         api.disconnect()
     except Exception as e:  # pylint: disable=broad-exception-caught
-        logger.log(logging.ERROR, "Exception: %s", e)
+        logger.error("Exception: %s", e)
         sys.exit(1)
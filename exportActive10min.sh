@@ -39,7 +39,7 @@ if [ "$IS_CAPTURING" == "YES" ]; then
     TEMP_ACTIVE="tmp$(date +%s).active"
 
     # Save the current capture to a temporary file
-    ./ActiveProApi.py --id=-1 -q --not-capturing --save-capture "$TEMP_ACTIVE"
+    ./ActiveProApi.py --id=-1 -q --save-capture "$TEMP_ACTIVE"
 
     # Start a new ActiveProDebugger.exe
     CMD /C 'C:\Program Files (x86)\Active-Pro Firmware Debugger\ActiveProDebugger.exe' &
@@ -48,7 +48,7 @@ if [ "$IS_CAPTURING" == "YES" ]; then
     sleep 5
 
     # Open the saved capture
-    ./ActiveProApi.py --id=-1 -q --not-capturing --open-capture "$TEMP_ACTIVE"
+    ./ActiveProApi.py --id=-1 -q --open-capture "$TEMP_ACTIVE"
 fi
 
 # Export the data between cursors to a CSV file